@@ -33,12 +33,12 @@ async def register(user: schemas.UserCreate, db: AsyncSession = Depends(database
     )
     if existing.scalar_one_or_none():
         raise HTTPException(status_code=400, detail="Имя пользователя уже занято")
-    hashed_pw = auth.hash_password(user.password)
+    hashed_pw = await auth.hash_password(user.password)
     db_user = User(username=user.username, hashed_password=hashed_pw)
     db.add(db_user)
     await db.commit()
     access_token = create_access_token(
-        data={"sub": user.username},
+        data={"sub": db_user.username, "uid": db_user.id},
         expires_delta=timedelta(minutes=30)
     )
     return {"access_token": access_token, "token_type": "bearer"}
@@ -68,5 +68,5 @@ async def login(user: schemas.UserCreate, db: AsyncSession = Depends(database.ge
             detail="Неверное имя пользователя или пароль",
             headers={"WWW-Authenticate": "Bearer"},
         )
-    access_token = create_access_token(data={"sub": authenticated_user.username})
+    access_token = create_access_token(data={"sub": authenticated_user.username, "uid": authenticated_user.id})
     return {"access_token": access_token, "token_type": "bearer"}
@@ -1,12 +1,33 @@
 # app/api/books.py
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Body, Depends, HTTPException, Request, Response, status, Query
+from fastapi.responses import ORJSONResponse
+from pydantic import TypeAdapter
 from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List
+import hashlib
 from .. import crud, schemas, database
-from ..auth import get_current_user
+from ..auth import get_current_user_id
 
 router = APIRouter(prefix="/books", tags=["📚 Книги"])
 
+# Список книг валидируется и сериализуется одним проходом в pydantic-core
+_books_adapter = TypeAdapter(List[schemas.BookResponse])
+
+BOOKS_CACHE_CONTROL = "private, max-age=30"
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    # If-None-Match сравнивается слабо: прокси со сжатием (nginx gzip)
+    # превращают наш ETag в W/"...", а "*" совпадает с любым
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        if tag == "*":
+            return True
+        if tag.startswith("W/"):
+            tag = tag[2:]
+        if tag == etag:
+            return True
+    return False
+
 @router.post(
     "/",
     response_model=schemas.BookResponse,
@@ -24,19 +45,49 @@ router = APIRouter(prefix="/books", tags=["📚 Книги"])
 async def create_book(
     book: schemas.BookCreate,
     db: AsyncSession = Depends(database.get_db),
-    current_user = Depends(get_current_user)
+    current_user_id: int = Depends(get_current_user_id)
 ):
-    return await crud.create_book(db, book, current_user.id)
+    return await crud.create_book(db, book, current_user_id)
+
+@router.post(
+    "/bulk",
+    response_model=List[schemas.BookResponse],
+    summary="Добавить несколько книг",
+    description="""
+    Создаёт сразу несколько книг одним запросом — например, при импорте библиотеки.
+    
+    **Тело запроса:** список книг (от 1 до 1000) с теми же полями, что и при добавлении одной книги.
+    
+    **Ответ:** Созданные книги в том же порядке, что и в запросе.
+    
+    **Доступ:** Только для авторизованных пользователей.
+    """
+)
+async def bulk_create_books(
+    books: List[schemas.BookCreate] = Body(..., min_length=1, max_length=1000),
+    db: AsyncSession = Depends(database.get_db),
+    current_user_id: int = Depends(get_current_user_id)
+):
+    return await crud.bulk_create_books(db, books, current_user_id)
 
 @router.get(
     "/",
-    response_model=List[schemas.BookResponse],
+    response_model=None,
+    responses={200: {"model": schemas.BookPage}},
     summary="Получить все книги",
     description="""
-    Возвращает список всех книг, принадлежащих текущему пользователю.
+    Возвращает страницу книг, принадлежащих текущему пользователю, в порядке добавления.
     
     **Опционально:**
     - Параметр `search` позволяет искать книги по названию или автору (регистронезависимо).
+    - Параметр `after_id` — идентификатор последней книги предыдущей страницы.
+    - Параметр `limit` — размер страницы (1–100).
+    
+    **Ответ:** Объект с полями `items` (книги) и `next` — значение `after_id`
+    для следующей страницы или `null`, если страница последняя.
+    
+    **Кэширование:** Ответ содержит заголовок `ETag`. Если передать его в
+    `If-None-Match` и книги с тех пор не менялись, вернётся `304 Not Modified` без тела.
     
     **Пример поиска:**
     ```
@@ -47,11 +98,27 @@ async def create_book(
     """
 )
 async def read_books(
+    request: Request,
     search: str = Query(None, description="Поиск по названию или автору"),
+    after_id: int = Query(0, ge=0, description="Идентификатор последней книги предыдущей страницы"),
+    limit: int = Query(100, ge=1, le=100, description="Размер страницы"),
     db: AsyncSession = Depends(database.get_db),
-    current_user = Depends(get_current_user)
+    current_user_id: int = Depends(get_current_user_id)
 ):
-    return await crud.get_books(db, current_user.id, search=search)
+    version = await crud.get_books_version(db, current_user_id)
+    etag_source = repr((current_user_id, version, search, after_id, limit))
+    etag = '"' + hashlib.sha256(etag_source.encode('utf-8')).hexdigest() + '"'
+    headers = {"ETag": etag, "Cache-Control": BOOKS_CACHE_CONTROL}
+    if etag_matches(request.headers.get("if-none-match", ""), etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    books = await crud.get_books(db, current_user_id, after_id=after_id, limit=limit, search=search)
+    next_after_id = books[-1].id if len(books) == limit else None
+    items = _books_adapter.validate_python(books, from_attributes=True)
+    return ORJSONResponse({
+        "items": _books_adapter.dump_python(items, mode="json"),
+        "next": next_after_id
+    }, headers=headers)
 
 
 @router.put(
@@ -75,9 +142,9 @@ async def update_book(
     book_id: int,
     book_update: schemas.BookUpdate,
     db: AsyncSession = Depends(database.get_db),
-    current_user = Depends(get_current_user)
+    current_user_id: int = Depends(get_current_user_id)
 ):
-    book = await crud.update_book(db, book_id, book_update, current_user.id)
+    book = await crud.update_book(db, book_id, book_update, current_user_id)
     if not book:
         raise HTTPException(status_code=404, detail="Книга не найдена или не принадлежит вам")
     return book
@@ -100,9 +167,9 @@ async def update_book(
 async def delete_book(
     book_id: int,
     db: AsyncSession = Depends(database.get_db),
-    current_user = Depends(get_current_user)
+    current_user_id: int = Depends(get_current_user_id)
 ):
-    success = await crud.delete_book(db, book_id, current_user.id)
+    success = await crud.delete_book(db, book_id, current_user_id)
     if not success:
         raise HTTPException(status_code=404, detail="Книга не найдена или не принадлежит вам")
     return {"detail": "Книга удалена"}
\ No newline at end of file
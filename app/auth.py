@@ -1,7 +1,16 @@
 # app/auth.py
-from datetime import datetime, timedelta
+from datetime import timedelta
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import hashlib
+import os
+import time
 import bcrypt
-from jose import jwt, JWTError
+from argon2 import PasswordHasher
+from argon2.exceptions import InvalidHashError, VerificationError
+import jwt
+from jwt import InvalidTokenError as JWTError
 from fastapi import Depends, HTTPException, status, Request, Response
 from fastapi.security import OAuth2PasswordBearer
 from sqlalchemy.ext.asyncio import AsyncSession
@@ -13,30 +22,89 @@ SECRET_KEY = "your-super-secret-jwt-key-change-in-production"
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 COOKIE_NAME = "library_token"
+_SECRET_BYTES = SECRET_KEY.encode('utf-8')
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="api/auth/login")
 
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return bcrypt.checkpw(
-        plain_password.encode('utf-8'),
-        hashed_password.encode('utf-8')
-    )
+# Параметры argon2id: ~50 мс на хэш на современном x86.
+# Для тестов можно понизить через переменные окружения
+ARGON2_TIME_COST = int(os.getenv("ARGON2_TIME_COST", "2"))
+ARGON2_MEMORY_COST = int(os.getenv("ARGON2_MEMORY_COST", "19456"))
+_hasher = PasswordHasher(
+    time_cost=ARGON2_TIME_COST,
+    memory_cost=ARGON2_MEMORY_COST,
+    parallelism=1,
+    hash_len=32,
+    salt_len=16,
+)
+
+# Хэширование блокирует поток на десятки миллисекунд, поэтому выполняем его
+# в отдельном пуле, не занимая цикл событий
+_hash_pool = ThreadPoolExecutor(max_workers=os.cpu_count(), thread_name_prefix="password-hash")
+
+# Кэш успешных проверок пароля: (хэш + sha256 пароля) -> True.
+# Хранится только в памяти процесса и теряется при перезапуске.
+# Неудачные проверки не кэшируются, чтобы не ускорять перебор паролей.
+VERIFY_CACHE_SIZE = 4096
+_verify_cache: "OrderedDict[str, bool]" = OrderedDict()
+
+def _is_bcrypt_hash(hashed_password: str) -> bool:
+    return hashed_password.startswith("$2")
+
+def _check_password(plain_password: str, hashed_password: str) -> bool:
+    if _is_bcrypt_hash(hashed_password):
+        # Старые хэши bcrypt: пароль при хэшировании обрезался до 72 байт
+        return bcrypt.checkpw(
+            plain_password.encode('utf-8')[:72],
+            hashed_password.encode('utf-8')
+        )
+    try:
+        return _hasher.verify(hashed_password, plain_password)
+    except (VerificationError, InvalidHashError):
+        return False
+
+async def verify_password(plain_password: str, hashed_password: str) -> bool:
+    key = hashed_password + ":" + hashlib.sha256(plain_password.encode('utf-8')).hexdigest()
+    if key in _verify_cache:
+        return True
+    loop = asyncio.get_running_loop()
+    valid = await loop.run_in_executor(_hash_pool, _check_password, plain_password, hashed_password)
+    if valid:
+        if len(_verify_cache) >= VERIFY_CACHE_SIZE:
+            _verify_cache.popitem(last=False)
+        _verify_cache[key] = True
+    return valid
+
+def password_needs_rehash(hashed_password: str) -> bool:
+    return _is_bcrypt_hash(hashed_password) or _hasher.check_needs_rehash(hashed_password)
 
-def hash_password(password: str) -> str:
-    password_bytes = password.encode('utf-8')
-    if len(password_bytes) > 72:
-        password_bytes = password_bytes[:72]
-    salt = bcrypt.gensalt()
-    hashed = bcrypt.hashpw(password_bytes, salt)
-    return hashed.decode('utf-8')
+async def hash_password(password: str) -> str:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_hash_pool, _hasher.hash, password)
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
-    to_encode = data.copy()
-    if expires_delta:
-        expire = datetime.utcnow() + expires_delta
-    else:
-        expire = datetime.utcnow() + timedelta(minutes=15)
-    to_encode.update({"exp": expire})
-    return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
+    # exp как unix-время: без создания datetime на каждый токен
+    lifetime = int(expires_delta.total_seconds()) if expires_delta else 15 * 60
+    to_encode = {**data, "exp": int(time.time()) + lifetime}
+    return jwt.encode(to_encode, _SECRET_BYTES, algorithm=ALGORITHM)
+
+# Расшифрованные токены: токен -> payload. Payload детерминирован до exp,
+# поэтому при попадании в кэш проверяем только срок действия.
+TOKEN_CACHE_SIZE = 16_384
+_token_cache: "OrderedDict[str, dict]" = OrderedDict()
+
+def decode_token(token: str) -> dict:
+    payload = _token_cache.get(token)
+    if payload is not None:
+        if payload["exp"] > time.time():
+            _token_cache.move_to_end(token)
+            return payload
+        del _token_cache[token]
+    payload = jwt.decode(token, _SECRET_BYTES, algorithms=[ALGORITHM])
+    if "exp" in payload:
+        if len(_token_cache) >= TOKEN_CACHE_SIZE:
+            _token_cache.popitem(last=False)
+        _token_cache[token] = payload
+    return payload
 
 def set_auth_cookie(response: Response, token: str):
     response.set_cookie(
@@ -55,10 +123,35 @@ def get_token_from_cookie(request: Request) -> str | None:
 async def authenticate_user(db: AsyncSession, username: str, password: str):
     result = await db.execute(select(models.User).where(models.User.username == username))
     user = result.scalar_one_or_none()
-    if not user or not verify_password(password, user.hashed_password):
+    if not user or not await verify_password(password, user.hashed_password):
         return False
+    # Хэши bcrypt и argon2 с устаревшими параметрами обновляем при входе
+    if password_needs_rehash(user.hashed_password):
+        user.hashed_password = await hash_password(password)
+        await db.commit()
     return user
 
+# Пользователи веб-сессий: username -> (момент истечения, User).
+# Активные сессии не ходят в БД чаще, чем раз в WEB_USER_CACHE_TTL секунд.
+WEB_USER_CACHE_TTL = 60
+WEB_USER_CACHE_SIZE = 10_000
+_web_user_cache: dict[str, tuple[float, models.User]] = {}
+
+def _get_cached_web_user(username: str) -> Optional[models.User]:
+    entry = _web_user_cache.get(username)
+    if entry is None:
+        return None
+    expires_at, user = entry
+    if expires_at < time.monotonic():
+        del _web_user_cache[username]
+        return None
+    return user
+
+def _cache_web_user(user: models.User):
+    if len(_web_user_cache) >= WEB_USER_CACHE_SIZE:
+        _web_user_cache.pop(next(iter(_web_user_cache)))
+    _web_user_cache[user.username] = (time.monotonic() + WEB_USER_CACHE_TTL, user)
+
 async def get_current_user_web(
     request: Request,
     db: AsyncSession = Depends(database.get_db)
@@ -67,14 +160,46 @@ async def get_current_user_web(
     if not token:
         return None
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        payload = decode_token(token)
         username: str = payload.get("sub")
         if username is None:
             return None
     except JWTError:
         return None
+    user = _get_cached_web_user(username)
+    if user is not None:
+        return user
     result = await db.execute(select(models.User).filter(models.User.username == username))
-    return result.scalar_one_or_none()
+    user = result.scalar_one_or_none()
+    if user is not None:
+        _cache_web_user(user)
+    return user
+
+async def require_web_user(request: Request) -> models.User:
+    # Пользователь уже определён middleware в app.main
+    user = request.state.user
+    if user is None:
+        raise HTTPException(
+            status_code=status.HTTP_303_SEE_OTHER,
+            headers={"Location": "/web/login"},
+        )
+    return user
+
+async def get_current_user_id(token: str = Depends(oauth2_scheme)) -> int:
+    # id пользователя берётся из claim uid, без запроса к БД
+    credentials_exception = HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Could not validate credentials",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+    try:
+        payload = decode_token(token)
+    except JWTError:
+        raise credentials_exception
+    user_id = payload.get("uid")
+    if not isinstance(user_id, int):
+        raise credentials_exception
+    return user_id
 
 async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(database.get_db)):
     credentials_exception = HTTPException(
@@ -83,7 +208,7 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession
         headers={"WWW-Authenticate": "Bearer"},
     )
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        payload = decode_token(token)
         username: str = payload.get("sub")
         if username is None:
             raise credentials_exception
@@ -93,4 +218,16 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession
     user = result.scalar_one_or_none()
     if user is None:
         raise credentials_exception
-    return user
\ No newline at end of file
+    return user
+
+def _warmup():
+    # Первый вызов argon2 инициализирует расширение; делаем это при импорте,
+    # а не на первом /register или /login. Пул здесь не трогаем: поток,
+    # запущенный до fork (gunicorn --preload), в воркере не существует,
+    # и задачи пула зависли бы навсегда
+    try:
+        _hasher.hash("warmup")
+    except Exception:
+        pass
+
+_warmup()
@@ -1,6 +1,6 @@
 # app/crud.py
 from sqlalchemy.future import select
-from sqlalchemy import or_
+from sqlalchemy import or_, insert, update, delete, func, literal_column
 from . import models
 from .schemas import BookCreate, BookUpdate
 from sqlalchemy.ext.asyncio import AsyncSession
@@ -17,18 +17,62 @@ async def create_book(db: AsyncSession, book: BookCreate, owner_id: int):
     await db.refresh(db_book)
     return db_book
 
-async def get_books(db: AsyncSession, owner_id: int, skip: int = 0, limit: int = 100, search: str = None):
-    query = select(models.Book).where(models.Book.owner_id == owner_id)
-    if search:
+async def bulk_create_books(db: AsyncSession, books: list[BookCreate], owner_id: int) -> list[models.Book]:
+    if not books:
+        return []
+    rows = [{**book.model_dump(), "owner_id": owner_id} for book in books]
+    # Один INSERT ... VALUES (...), (...) RETURNING на весь список.
+    # Порядок строк RETURNING не гарантирован, а id растут в порядке VALUES
+    result = await db.scalars(insert(models.Book).values(rows).returning(models.Book))
+    db_books = sorted(result.all(), key=lambda book: book.id)
+    await db.commit()
+    return db_books
+
+def _contains(column, search: str, dialect: str):
+    # ilike и COLLATE NOCASE в SQLite сворачивают регистр только для ASCII;
+    # функция casefold (см. database.py) работает и с кириллицей, как trigram-индекс
+    if dialect == "sqlite":
+        return func.instr(func.casefold(column), search.casefold()) > 0
+    return column.ilike(f"%{search}%")
+
+async def get_books(db: AsyncSession, owner_id: int, after_id: int = 0, limit: int = 100, search: str = None):
+    # Keyset-пагинация: следующая страница начинается после after_id,
+    # поэтому глубина страницы не влияет на стоимость запроса
+    query = (
+        select(models.Book)
+        .where(models.Book.owner_id == owner_id, models.Book.id > after_id)
+        .order_by(models.Book.id)
+        .limit(limit)
+    )
+    dialect = db.bind.dialect.name
+    # Trigram-индекс находит подстроки от трёх символов; короткие запросы
+    # и другие СУБД ищут перебором строк владельца
+    if search and dialect == "sqlite" and len(search) >= 3:
+        phrase = '"' + search.replace('"', '""') + '"'
+        # FTS-индекс должен быть внешним циклом: иначе MATCH выполняется
+        # заново для каждой книги владельца
+        matches = select(models.books_fts.c.rowid).where(
+            literal_column("books_fts").op("MATCH")(phrase)
+        )
+        query = query.where(models.Book.id.in_(matches))
+    elif search:
         query = query.where(
             or_(
-                models.Book.title.ilike(f"%{search}%"),
-                models.Book.author.ilike(f"%{search}%")
+                _contains(models.Book.title, search, dialect),
+                _contains(models.Book.author, search, dialect)
             )
         )
-    result = await db.execute(query.offset(skip).limit(limit))
+    result = await db.execute(query)
     return result.scalars().all()
 
+async def get_books_version(db: AsyncSession, owner_id: int):
+    # Меняется при любом добавлении, изменении или удалении книги владельца
+    result = await db.execute(
+        select(func.max(models.Book.updated_at), func.count(), func.max(models.Book.id))
+        .where(models.Book.owner_id == owner_id)
+    )
+    return tuple(result.one())
+
 async def get_book_by_id(db: AsyncSession, book_id: int, owner_id: int):
     result = await db.execute(
         select(models.Book).where(models.Book.id == book_id, models.Book.owner_id == owner_id)
@@ -36,20 +80,27 @@ async def get_book_by_id(db: AsyncSession, book_id: int, owner_id: int):
     return result.scalar_one_or_none()
 
 async def update_book(db: AsyncSession, book_id: int, book_update: BookUpdate, owner_id: int):
-    book = await get_book_by_id(db, book_id, owner_id)
-    if not book:
-        return None
-    for key, value in book_update.model_dump(exclude_unset=True).items():
-        if value is not None:
-            setattr(book, key, value)
+    values = book_update.model_dump(exclude_unset=True, exclude_none=True)
+    if not values:
+        return await get_book_by_id(db, book_id, owner_id)
+    stmt = (
+        update(models.Book)
+        .where(models.Book.id == book_id, models.Book.owner_id == owner_id)
+        .values(**values)
+        .returning(models.Book)
+    )
+    result = await db.execute(stmt)
+    book = result.scalar_one_or_none()
     await db.commit()
-    await db.refresh(book)
     return book
 
 async def delete_book(db: AsyncSession, book_id: int, owner_id: int) -> bool:
-    book = await get_book_by_id(db, book_id, owner_id)
-    if not book:
-        return False
-    await db.delete(book)
+    stmt = (
+        delete(models.Book)
+        .where(models.Book.id == book_id, models.Book.owner_id == owner_id)
+        .returning(models.Book.id)
+    )
+    result = await db.execute(stmt)
+    deleted_id = result.scalar_one_or_none()
     await db.commit()
-    return True
\ No newline at end of file
+    return deleted_id is not None
\ No newline at end of file
@@ -1,11 +1,52 @@
 # app/database.py
+from sqlalchemy import event
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.orm import declarative_base, sessionmaker
+from sqlalchemy.pool import StaticPool
 import os
 
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite+aiosqlite:///./library.db")
+POOL_SIZE = int(os.getenv("POOL_SIZE", "20"))
+POOL_MAX_OVERFLOW = int(os.getenv("POOL_MAX_OVERFLOW", "10"))
 
-engine = create_async_engine(DATABASE_URL, echo=False)
+if ":memory:" in DATABASE_URL:
+    # In-memory SQLite живёт, пока открыто соединение, поэтому оно одно на всех
+    engine_options = {
+        "connect_args": {"check_same_thread": False},
+        "poolclass": StaticPool,
+    }
+else:
+    engine_options = {
+        "pool_size": POOL_SIZE,
+        "max_overflow": POOL_MAX_OVERFLOW,
+        "pool_pre_ping": True,
+        "pool_recycle": 3600,
+    }
+    if DATABASE_URL.startswith("sqlite"):
+        engine_options["connect_args"] = {"check_same_thread": False}
+
+engine = create_async_engine(DATABASE_URL, echo=False, **engine_options)
+
+SQLITE_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",     # читатели не блокируют писателей
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA cache_size=-20000",    # ~20 МБ страничного кэша
+    "PRAGMA mmap_size=268435456",  # 256 МБ
+)
+
+def _casefold(value):
+    return value.casefold() if value is not None else None
+
+if engine.dialect.name == "sqlite":
+    @event.listens_for(engine.sync_engine, "connect")
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for pragma in SQLITE_PRAGMAS:
+            cursor.execute(pragma)
+        cursor.close()
+        # lower() и NOCASE в SQLite понимают только ASCII; casefold нужен
+        # для регистронезависимого поиска по кириллице
+        dbapi_connection.create_function("casefold", 1, _casefold, deterministic=True)
 async_session = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
 
 Base = declarative_base()
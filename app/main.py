@@ -1,33 +1,154 @@
 from fastapi import FastAPI, Request, Depends, Response
-from fastapi.responses import RedirectResponse, JSONResponse, HTMLResponse
+from fastapi.responses import RedirectResponse, ORJSONResponse, HTMLResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 from starlette.exceptions import HTTPException as StarletteHTTPException
 from pathlib import Path
+from typing import Optional
+import asyncio
+import hashlib
+import os
+import tempfile
+import time
 from .database import Base, engine
+from .models import BOOKS_FTS_DDL
 from .web import routes as web_routes
 from .api import books, auth
 from .auth import get_current_user_web
+from sqlalchemy import inspect, text
 from sqlalchemy.ext.asyncio import AsyncSession
-from .database import get_db
+from .database import get_db, async_session
 
 app = FastAPI(
     title="Home Library API",
     description="A clean, secure, and async API for managing your personal book collection with JWT auth and web UI.",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=ORJSONResponse
 )
 
+@app.middleware("http")
+async def attach_web_user(request: Request, call_next):
+    # Пользователь веб-интерфейса определяется один раз за запрос,
+    # обработчики берут его из request.state.user
+    request.state.user = None
+    if request.url.path.startswith("/web"):
+        async with async_session() as db:
+            request.state.user = await get_current_user_web(request, db)
+    return await call_next(request)
+
+# Схему создаёт один воркер gunicorn, остальные ждут его и пропускают DDL
+DDL_LOCK_NAME = ".ddl.lock"
+DDL_LOCK_TIMEOUT = 30
+PG_DDL_LOCK_ID = 4242
+
+def add_missing_columns(sync_conn):
+    # create_all не меняет существующие таблицы: колонки, появившиеся
+    # в моделях позже (books.updated_at), добавляем сами
+    inspector = inspect(sync_conn)
+    for table in Base.metadata.sorted_tables:
+        existing = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name not in existing and column.nullable:
+                column_type = column.type.compile(dialect=sync_conn.dialect)
+                sync_conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}"))
+
+def add_missing_indexes(sync_conn):
+    # create_all создаёт индексы только вместе с новой таблицей
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(sync_conn, checkfirst=True)
+
+async def create_schema(conn):
+    await conn.run_sync(Base.metadata.create_all)
+    await conn.run_sync(add_missing_columns)
+    await conn.run_sync(add_missing_indexes)
+    if engine.dialect.name == "sqlite":
+        exists = await conn.execute(
+            text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'books_fts'")
+        )
+        if exists.scalar() is None:
+            for statement in BOOKS_FTS_DDL:
+                await conn.execute(text(statement))
+
+def ddl_lock_path() -> Optional[Path]:
+    database = engine.url.database
+    if engine.dialect.name == "sqlite":
+        # У каждого процесса своя in-memory БД: лок не нужен
+        if not database or database == ":memory:":
+            return None
+        # Лок лежит рядом с файлом SQLite: этот каталог и так должен быть
+        # доступен на запись
+        return Path(database).resolve().parent / DDL_LOCK_NAME
+    # Общий временный каталог: имя привязано к URL, чтобы разные БД
+    # не делили один лок
+    url = engine.url.render_as_string(hide_password=False)
+    name = f".ddl-{hashlib.sha256(url.encode('utf-8')).hexdigest()[:16]}.lock"
+    return Path(os.getenv("DDL_LOCK_DIR", tempfile.gettempdir())) / name
+
+async def wait_for_ddl_lock(lock_file: Path) -> bool:
+    deadline = time.monotonic() + DDL_LOCK_TIMEOUT
+    while lock_file.exists():
+        if time.monotonic() > deadline:
+            return False
+        await asyncio.sleep(0.1)
+    return True
+
 @app.on_event("startup")
 async def init_models():
-    async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
+    if engine.dialect.name == "postgresql":
+        async with engine.begin() as conn:
+            acquired = await conn.scalar(
+                text("SELECT pg_try_advisory_xact_lock(:lock_id)"), {"lock_id": PG_DDL_LOCK_ID}
+            )
+            if acquired:
+                await create_schema(conn)
+            else:
+                # Блокируемся, пока транзакция другого воркера не завершится
+                await conn.execute(
+                    text("SELECT pg_advisory_xact_lock(:lock_id)"), {"lock_id": PG_DDL_LOCK_ID}
+                )
+        return
+
+    lock_file = ddl_lock_path()
+    if lock_file is None:
+        async with engine.begin() as conn:
+            await create_schema(conn)
+        return
+
+    remove_lock = True
+    try:
+        fd = os.open(lock_file, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+    except FileExistsError:
+        if await wait_for_ddl_lock(lock_file):
+            return
+        # Лок остался от упавшего процесса: create_all идемпотентен, выполняем сами.
+        # Чужой лок не удаляем: его владелец может ещё выполнять DDL
+        fd = None
+        remove_lock = False
+    except OSError:
+        # Лок создать нельзя (каталог только для чтения и т. п.): выполняем DDL без него
+        fd = None
+        remove_lock = False
+    try:
+        async with engine.begin() as conn:
+            await create_schema(conn)
+    finally:
+        if fd is not None:
+            os.close(fd)
+        if remove_lock:
+            try:
+                lock_file.unlink(missing_ok=True)
+            except OSError:
+                pass
 
 # Путь к статике (корень проекта)
 BASE_DIR = Path(__file__).parent.parent
+templates = Jinja2Templates(directory=str(BASE_DIR / "templates"))
 app.mount("/static", StaticFiles(directory=str(BASE_DIR / "static")), name="static")
 
 # ПОДКЛЮЧАЕМ РОУТЕРЫ
 app.include_router(web_routes.router, prefix="/web")  # Веб-интерфейс
+app.include_router(web_routes.protected_router, prefix="/web")
 app.include_router(books.router, prefix="/api")       # API для книг
 app.include_router(auth.router, prefix="/api")        # API для аутентификации
 
@@ -43,18 +164,18 @@ async def root_redirect(request: Request, db: AsyncSession = Depends(get_db)):
 async def custom_http_exception_handler(request: Request, exc: StarletteHTTPException):
     if exc.status_code == 404:
         if request.url.path.startswith("/api"):
-            return JSONResponse(
+            return ORJSONResponse(
                 status_code=404,
                 content={"detail": "API endpoint not found"}
             )
         else:
-            templates = Jinja2Templates(directory=str(Path(__file__).parent.parent / "templates"))
             return templates.TemplateResponse(
                 "404.html",
                 {"request": request},
                 status_code=404
             )
-    return JSONResponse(
+    return ORJSONResponse(
         status_code=exc.status_code,
-        content={"detail": str(exc.detail)}
+        content={"detail": str(exc.detail)},
+        headers=exc.headers
     )
\ No newline at end of file
@@ -1,8 +1,12 @@
 # app/models.py
-from sqlalchemy import Column, Integer, String, ForeignKey
+from datetime import datetime, timezone
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Index, MetaData, Table
 from sqlalchemy.orm import relationship
 from .database import Base
 
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
 class User(Base):
     __tablename__ = "users"
     id = Column(Integer, primary_key=True, index=True)
@@ -16,4 +20,42 @@ class Book(Base):
     author = Column(String, index=True)
     description = Column(String, nullable=False)
     owner_id = Column(Integer, ForeignKey("users.id"))
-    owner = relationship("User")
\ No newline at end of file
+    # Время с микросекундами на стороне Python: CURRENT_TIMESTAMP в SQLite
+    # посекундный и не различил бы две правки подряд (см. ETag в api/books.py)
+    updated_at = Column(DateTime, default=_utcnow, onupdate=_utcnow)
+    owner = relationship("User")
+
+    __table_args__ = (
+        # Все выборки книг идут в разрезе владельца
+        Index("ix_books_owner_title", "owner_id", "title"),
+        # Постраничная выдача: WHERE owner_id = ? AND id > ? ORDER BY id
+        Index("ix_books_owner_id", "owner_id", "id"),
+    )
+
+# Полнотекстовый индекс SQLite (FTS5, trigram) по названию и автору.
+# Таблица создаётся отдельно в init_models, поэтому у неё своя MetaData
+# и create_all её не трогает.
+books_fts = Table(
+    "books_fts", MetaData(),
+    Column("rowid", Integer, primary_key=True),
+    Column("title", String),
+    Column("author", String),
+)
+
+BOOKS_FTS_DDL = (
+    """CREATE VIRTUAL TABLE books_fts USING fts5(
+        title, author, content='books', content_rowid='id', tokenize='trigram'
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS books_fts_ai AFTER INSERT ON books BEGIN
+        INSERT INTO books_fts(rowid, title, author) VALUES (new.id, new.title, new.author);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS books_fts_ad AFTER DELETE ON books BEGIN
+        INSERT INTO books_fts(books_fts, rowid, title, author) VALUES ('delete', old.id, old.title, old.author);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS books_fts_au AFTER UPDATE ON books BEGIN
+        INSERT INTO books_fts(books_fts, rowid, title, author) VALUES ('delete', old.id, old.title, old.author);
+        INSERT INTO books_fts(rowid, title, author) VALUES (new.id, new.title, new.author);
+    END""",
+    # Индексируем книги, добавленные до появления FTS-таблицы
+    "INSERT INTO books_fts(books_fts) VALUES ('rebuild')",
+)
@@ -1,13 +1,22 @@
 # app/schemas.py
-from pydantic import BaseModel, Field
-from typing import Optional
+from pydantic import BaseModel, ConfigDict, Field
+from typing import List, Optional
 
 class BookCreate(BaseModel):
+    model_config = ConfigDict(
+        from_attributes=True,
+        str_strip_whitespace=True,
+        frozen=True,
+        extra="forbid"
+    )
+
     title: str = Field(..., min_length=1, max_length=200)
     author: str = Field(..., min_length=1, max_length=100)
     description: str = Field(..., min_length=1, max_length=1000)
 
 class BookUpdate(BaseModel):
+    model_config = ConfigDict(str_strip_whitespace=True, frozen=True, extra="forbid")
+
     title: Optional[str] = Field(None, min_length=1, max_length=200)
     author: Optional[str] = Field(None, min_length=1, max_length=100)
     description: str = Field(..., min_length=1, max_length=1000)
@@ -16,13 +25,19 @@ class BookResponse(BookCreate):
     id: int
     owner_id: int
 
-    class Config:
-        from_attributes = True
+class BookPage(BaseModel):
+    items: List[BookResponse]
+    next: Optional[int] = None
 
 class UserCreate(BaseModel):
+    # Без str_strip_whitespace: пробелы по краям пароля значимы
+    model_config = ConfigDict(frozen=True, extra="forbid")
+
     username: str = Field(..., min_length=3, max_length=50)
     password: str = Field(..., min_length=6, max_length=72)
 
 class Token(BaseModel):
+    model_config = ConfigDict(frozen=True)
+
     access_token: str
-    token_type: str
\ No newline at end of file
+    token_type: str
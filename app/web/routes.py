@@ -2,8 +2,9 @@
 from fastapi import APIRouter, Request, Form, HTTPException, Depends, Response
 from fastapi.responses import HTMLResponse, RedirectResponse, JSONResponse
 from fastapi.templating import Jinja2Templates
+from pydantic import ValidationError
 from sqlalchemy.ext.asyncio import AsyncSession
-from .. import database, auth, crud, schemas
+from .. import database, auth, crud, schemas, models
 from sqlalchemy import select
 from pathlib import Path
 
@@ -11,8 +12,16 @@ from pathlib import Path
 BASE_DIR = Path(__file__).resolve().parent.parent.parent
 templates = Jinja2Templates(directory=str(BASE_DIR / "templates"))
 
+# Публичные страницы: вход, регистрация, выход
 router = APIRouter()
 
+BOOK_FORM_ERROR = (
+    "Название (до 200 символов), автор (до 100) и описание (до 1000) "
+    "не могут быть пустыми или состоять только из пробелов"
+)
+# Страницы для авторизованных: без пользователя — редирект на /web/login
+protected_router = APIRouter(dependencies=[Depends(auth.require_web_user)])
+
 @router.get(
     "/",
     response_class=HTMLResponse,
@@ -73,7 +82,7 @@ async def login_web(
             {"request": request, "error": "Неверное имя пользователя или пароль"},
             status_code=401
         )
-    token = auth.create_access_token(data={"sub": user.username})
+    token = auth.create_access_token(data={"sub": user.username, "uid": user.id})
     
     redirect_response = RedirectResponse("/web/books", status_code=303)
     auth.set_auth_cookie(redirect_response, token)
@@ -150,19 +159,19 @@ async def register_web(
         )
 
     # Создание пользователя
-    hashed_pw = auth.hash_password(password)
+    hashed_pw = await auth.hash_password(password)
     db_user = auth.models.User(username=username, hashed_password=hashed_pw)
     db.add(db_user)
     await db.commit()
     
     # Установка куки и редирект
-    token = auth.create_access_token(data={"sub": username})
+    token = auth.create_access_token(data={"sub": db_user.username, "uid": db_user.id})
     
     redirect_response = RedirectResponse("/web/books", status_code=303)
     auth.set_auth_cookie(redirect_response, token)
     return redirect_response
 
-@router.get(
+@protected_router.get(
     "/books",
     response_class=HTMLResponse,
     summary="Список книг (веб-интерфейс)",
@@ -180,12 +189,9 @@ async def register_web(
 async def books_list(
     request: Request,
     q: str = None,
-    db: AsyncSession = Depends(database.get_db)
+    db: AsyncSession = Depends(database.get_db),
+    user: models.User = Depends(auth.require_web_user)
 ):
-    user = await auth.get_current_user_web(request, db)
-    if not user:
-        return RedirectResponse("/web/login", status_code=303)
-    
     books = await crud.get_books(db, user.id, search=q)
     return templates.TemplateResponse("books.html", {
         "request": request,
@@ -193,7 +199,7 @@ async def books_list(
         "search_query": q
     })
 
-@router.get(
+@protected_router.get(
     "/books/new",
     response_class=HTMLResponse,
     summary="Форма добавления новой книги",
@@ -209,13 +215,10 @@ async def books_list(
     Доступ: Только для авторизованных пользователей.
     """
 )
-async def add_book_form(request: Request, db: AsyncSession = Depends(database.get_db)):
-    user = await auth.get_current_user_web(request, db)
-    if not user:
-        return RedirectResponse("/web/login", status_code=303)
+async def add_book_form(request: Request):
     return templates.TemplateResponse("add_book.html", {"request": request})
 
-@router.post(
+@protected_router.post(
     "/books/create",
     summary="Создание книги через веб-форму",
     description="""
@@ -234,18 +237,23 @@ async def create_book_web(
     request: Request,
     title: str = Form(...),
     author: str = Form(...),
-    description: str = Form(...), 
-    db: AsyncSession = Depends(database.get_db)
+    description: str = Form(...),
+    db: AsyncSession = Depends(database.get_db),
+    user: models.User = Depends(auth.require_web_user)
 ):
-    user = await auth.get_current_user_web(request, db)
-    if not user:
-        return RedirectResponse("/web/login", status_code=303)
     # ПЕРЕДАЁМ description!
-    book_in = schemas.BookCreate(title=title, author=author, description=description)
+    try:
+        book_in = schemas.BookCreate(title=title, author=author, description=description)
+    except ValidationError:
+        return templates.TemplateResponse(
+            "add_book.html",
+            {"request": request, "error": BOOK_FORM_ERROR},
+            status_code=400
+        )
     await crud.create_book(db, book_in, user.id)
     return RedirectResponse("/web/books", status_code=303)
 
-@router.get(
+@protected_router.get(
     "/books/{book_id}/edit",
     response_class=HTMLResponse,
     summary="Форма редактирования книги",
@@ -261,17 +269,15 @@ async def create_book_web(
 async def edit_book_form(
     request: Request,
     book_id: int,
-    db: AsyncSession = Depends(database.get_db)
+    db: AsyncSession = Depends(database.get_db),
+    user: models.User = Depends(auth.require_web_user)
 ):
-    user = await auth.get_current_user_web(request, db)
-    if not user:
-        return RedirectResponse("/web/login", status_code=303)
     book = await crud.get_book_by_id(db, book_id, user.id)
     if not book:
         raise HTTPException(status_code=404, detail="Книга не найдена")
     return templates.TemplateResponse("edit_book.html", {"request": request, "book": book})
 
-@router.post(
+@protected_router.post(
     "/books/{book_id}/update",
     summary="Обновление книги через веб-форму",
     description="""
@@ -287,23 +293,30 @@ async def edit_book_form(
     """
 )
 async def update_book_web(
+    request: Request,
     book_id: int,
     title: str = Form(...),
     author: str = Form(...),
     description: str = Form(...),
-    request: Request = None,
-    db: AsyncSession = Depends(database.get_db)
+    db: AsyncSession = Depends(database.get_db),
+    user: models.User = Depends(auth.require_web_user)
 ):
-    user = await auth.get_current_user_web(request, db)
-    if not user:
-        return RedirectResponse("/web/login", status_code=303)
-    book_update = schemas.BookUpdate(title=title, author=author, description=description)
+    try:
+        book_update = schemas.BookUpdate(title=title, author=author, description=description)
+    except ValidationError:
+        # Показываем форму заново с тем, что ввёл пользователь
+        book = {"id": book_id, "title": title, "author": author, "description": description}
+        return templates.TemplateResponse(
+            "edit_book.html",
+            {"request": request, "book": book, "error": BOOK_FORM_ERROR},
+            status_code=400
+        )
     updated = await crud.update_book(db, book_id, book_update, user.id)
     if not updated:
         raise HTTPException(status_code=404, detail="Книга не найдена")
     return RedirectResponse("/web/books", status_code=303)
 
-@router.post(
+@protected_router.post(
     "/books/{book_id}/delete",
     summary="Удаление книги через веб-форму",
     description="""
@@ -316,12 +329,9 @@ async def update_book_web(
 )
 async def delete_book_web(
     book_id: int,
-    request: Request,
-    db: AsyncSession = Depends(database.get_db)
+    db: AsyncSession = Depends(database.get_db),
+    user: models.User = Depends(auth.require_web_user)
 ):
-    user = await auth.get_current_user_web(request, db)
-    if not user:
-        return RedirectResponse("/web/login", status_code=303)
     success = await crud.delete_book(db, book_id, user.id)
     if not success:
         raise HTTPException(status_code=404, detail="Книга не найдена")
@@ -352,7 +362,7 @@ async def books_json(
     
     Использует сессионную авторизацию (куки), как в веб-интерфейсе.
     """
-    user = await auth.get_current_user_web(request, db)
+    user = request.state.user
     if not user:
         return JSONResponse(
             status_code=401,